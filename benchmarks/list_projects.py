@@ -0,0 +1,99 @@
+"""Benchmark GET /projects queries on a million-row projects table.
+
+Usage: python benchmarks/list_projects.py [rows]
+
+Times the per-user keyset listing and a status/updated_at scan, with and
+without the composite indexes on the projects table.
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from tts_api import crud, models
+
+USERS = 1000
+STATUSES = ["completed"] * 90 + ["failed"] * 6 + ["deleted"] * 3 + ["processing"]
+QUERIES = 200
+
+def populate(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{"api_key": f"key-{i}"} for i in range(USERS)])
+        start = datetime.datetime(2024, 1, 1)
+        batch = []
+        for i in range(rows):
+            created_at = start + datetime.timedelta(seconds=i * 30)
+            batch.append({
+                "uuid": f"uuid-{i}",
+                "user_id": random.randint(1, USERS),
+                "voice": "en-US-JennyNeural",
+                "text": "x" * 200,
+                "status": random.choice(STATUSES),
+                "created_at": created_at,
+                "updated_at": created_at + datetime.timedelta(seconds=random.randint(5, 600)),
+                "original_filename": "input.txt"
+            })
+            if len(batch) == 50_000:
+                conn.execute(models.Project.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.Project.__table__.insert(), batch)
+
+def time_queries(Session):
+    db = Session()
+    try:
+        started = time.perf_counter()
+        for _ in range(QUERIES):
+            user_id = random.randint(1, USERS)
+            # First page, then follow the cursor once
+            _, cursor = crud.get_user_projects(db, user_id=user_id, limit=20)
+            if cursor:
+                crud.get_user_projects(db, user_id=user_id, limit=20, cursor=cursor)
+        listing = (time.perf_counter() - started) / QUERIES * 1000
+
+        cutoff = datetime.datetime(2024, 6, 1)
+        started = time.perf_counter()
+        for _ in range(QUERIES):
+            db.query(models.Project.id).filter(
+                models.Project.status == "processing",
+                models.Project.updated_at < cutoff
+            ).all()
+        scan = (time.perf_counter() - started) / QUERIES * 1000
+        return listing, scan
+    finally:
+        db.close()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        print(f"Populating {rows} projects for {USERS} users...")
+        populate(engine, rows)
+
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        indexed = time_queries(Session)
+
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_projects_user_id_created_at"))
+            conn.execute(text("DROP INDEX ix_projects_status_updated_at"))
+            conn.execute(text("ANALYZE"))
+        unindexed = time_queries(Session)
+
+    print(f"{'query':<28}{'no index (ms)':>16}{'indexed (ms)':>16}")
+    print(f"{'list by user (2 pages)':<28}{unindexed[0]:>16.2f}{indexed[0]:>16.2f}")
+    print(f"{'status + updated_at scan':<28}{unindexed[1]:>16.2f}{indexed[1]:>16.2f}")
+
+if __name__ == "__main__":
+    main()
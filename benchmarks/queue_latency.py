@@ -0,0 +1,158 @@
+"""Mixed-size queue load test: FIFO versus fast lane plus shortest-job-first.
+
+Usage: python benchmarks/queue_latency.py [rounds]
+
+Synthesis is simulated with a sleep proportional to the text length.
+
+The burst scenario submits a full queue of short requests and a few
+novel-length projects in random order per round, and reports latency from
+submission to completion for one FIFO worker, two FIFO workers (the same
+capacity as the lanes) and the lanes.
+
+The starvation scenario queues one long project and then keeps the queue
+full of short requests, and reports how long the long project waited with
+and without aging.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tts_api import crud, models
+
+SECONDS_PER_CHAR = 2e-6
+SHORT_PER_ROUND = 12
+LONG_PER_ROUND = 3
+MAX_QUEUE_SIZE = 15
+
+# Simulated time runs faster than real synthesis, assumed at 1000 chars per second,
+# so aging is sped up by the same factor to keep its effect comparable
+AGING_SPEEDUP = (1 / SECONDS_PER_CHAR) / 1000
+STARVATION_SECONDS = 3.0
+
+def fifo_next(db, lane):
+    # Position-ordered selection, as before lanes were introduced
+    queue_entry = db.query(models.Queue).order_by(models.Queue.position).first()
+    return queue_entry.project_id if queue_entry else None
+
+async def worker(Session, lane, next_project, started, finished, arrivals_done=None):
+    db = Session()
+    try:
+        while True:
+            project_id = next_project(db, lane)
+            if project_id is None:
+                if arrivals_done is None or arrivals_done.is_set():
+                    break
+                await asyncio.sleep(0.001)
+                continue
+            crud.remove_project_from_queue(db, project_id)
+            started[project_id] = time.perf_counter()
+            project = db.query(models.Project).filter(models.Project.id == project_id).first()
+            await asyncio.sleep(len(project.text) * SECONDS_PER_CHAR)
+            finished[project_id] = time.perf_counter()
+    finally:
+        db.close()
+
+def submit(db, user_id, length):
+    project = crud.create_project(db, user_id=user_id, voice="en-US-JennyNeural",
+                                  text="x" * length, original_filename="input.txt")
+    crud.add_project_to_queue(db, project.id, lane=crud.queue_lane(length), text_length=length)
+    return project.id
+
+def start_workers(Session, policy, started, finished, arrivals_done=None):
+    if policy == "lanes":
+        workers = [(crud.STANDARD_LANE, crud.get_next_project_in_queue),
+                   (crud.FAST_LANE, crud.get_next_project_in_queue)]
+    else:
+        workers = [(crud.STANDARD_LANE, fifo_next)] * (2 if policy == "fifo x2" else 1)
+    return [worker(Session, lane, next_project, started, finished, arrivals_done) for lane, next_project in workers]
+
+async def run_round(Session, user_id, policy):
+    db = Session()
+    lengths = [random.randint(50, 400) for _ in range(SHORT_PER_ROUND)]
+    lengths += [random.randint(50_000, 100_000) for _ in range(LONG_PER_ROUND)]
+    random.shuffle(lengths)
+    submitted = {}
+    for length in lengths:
+        project_id = submit(db, user_id, length)
+        submitted[project_id] = (time.perf_counter(), length)
+    db.close()
+
+    started, finished = {}, {}
+    await asyncio.gather(*start_workers(Session, policy, started, finished))
+    return [(finished[project_id] - at, length) for project_id, (at, length) in submitted.items()]
+
+async def run_starvation(Session, user_id):
+    """Queue one long project, keep the queue full of short ones, return how long the long one waited."""
+    db = Session()
+    long_id = submit(db, user_id, 80_000)
+    submitted_at = time.perf_counter()
+    started, finished = {}, {}
+    arrivals_done = asyncio.Event()
+
+    async def arrivals():
+        while time.perf_counter() - submitted_at < STARVATION_SECONDS:
+            while db.query(models.Queue).count() < MAX_QUEUE_SIZE:
+                submit(db, user_id, random.randint(50, 400))
+            await asyncio.sleep(0.001)
+        arrivals_done.set()
+
+    await asyncio.gather(arrivals(), *start_workers(Session, "lanes", started, finished, arrivals_done))
+    db.close()
+    return started[long_id] - submitted_at
+
+async def with_database(scenario, *args):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        db = Session()
+        user_id = crud.create_user(db, api_key="bench").id
+        db.close()
+        try:
+            return await scenario(Session, user_id, *args)
+        finally:
+            engine.dispose()
+
+async def run_policy(Session, user_id, policy, rounds):
+    results = []
+    for _ in range(rounds):
+        results += await run_round(Session, user_id, policy)
+    return results
+
+def summarize(name, results):
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    short = [latency * 1000 for latency, length in results if length <= crud.DEFAULT_FAST_LANE_MAX_CHARS]
+    long = [latency * 1000 for latency, length in results if length > crud.DEFAULT_FAST_LANE_MAX_CHARS]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<10}{statistics.median(latencies):>12.1f}{p95:>12.1f}"
+          f"{statistics.median(short):>14.1f}{statistics.median(long):>14.1f}")
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print("Burst of mixed-size projects")
+    print(f"{'policy':<10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'short p50':>14}{'long p50':>14}")
+    for policy in ("fifo", "fifo x2", "lanes"):
+        summarize(policy, asyncio.run(with_database(run_policy, policy, rounds)))
+
+    print(f"\nLong project behind a continuous stream of short ones for {STARVATION_SECONDS:.0f} s")
+    aging = crud.AGING_CHARS_PER_SECOND
+    for name, rate in (("no aging", 0), ("aging", aging * AGING_SPEEDUP)):
+        crud.AGING_CHARS_PER_SECOND = rate
+        waited = asyncio.run(with_database(run_starvation))
+        print(f"{name:<10}long project started after {waited * 1000:.1f} ms")
+    crud.AGING_CHARS_PER_SECOND = aging
+
+if __name__ == "__main__":
+    main()
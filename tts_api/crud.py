@@ -1,9 +1,24 @@
 # crud.py
 
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
 from . import models
 import uuid
 import datetime
+import base64
+
+# Queue lanes: short texts go to the fast lane, which has a reserved worker
+FAST_LANE = "fast"
+STANDARD_LANE = "standard"
+
+# Default maximum length, in characters, of a text queued in the fast lane
+DEFAULT_FAST_LANE_MAX_CHARS = 500
+
+# Estimated size, in characters, forgiven per second of waiting so long jobs can't starve
+AGING_CHARS_PER_SECOND = 100
+
+def queue_lane(text_length: int, fast_lane_max_chars: int = DEFAULT_FAST_LANE_MAX_CHARS):
+    return FAST_LANE if text_length <= fast_lane_max_chars else STANDARD_LANE
 
 def get_user_by_api_key(db: Session, api_key: str):
     return db.query(models.User).filter(models.User.api_key == api_key).first()
@@ -23,13 +38,14 @@ def delete_user(db: Session, api_key: str):
         return True
     return False
 
-def create_project(db: Session, user_id: int, voice: str, text: str, original_filename: str):
+def create_project(db: Session, user_id: int, voice: str, text: str, original_filename: str, segments: str = None):
     project_uuid = str(uuid.uuid4())
     db_project = models.Project(
         uuid=project_uuid,
         user_id=user_id,
         voice=voice,
         text=text,
+        segments=segments,
         original_filename=original_filename,
         status="queued"
     )
@@ -41,6 +57,58 @@ def create_project(db: Session, user_id: int, voice: str, text: str, original_fi
 def get_project_by_uuid(db: Session, uuid: str):
     return db.query(models.Project).filter(models.Project.uuid == uuid).first()
 
+def encode_project_cursor(created_at: datetime.datetime, project_id: int):
+    raw = f"{created_at.isoformat()}|{project_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_project_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, project_id = raw.split("|")
+        return datetime.datetime.fromisoformat(created_at), int(project_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def to_naive_utc(value: datetime.datetime):
+    # Timestamps are stored as naive UTC, and SQLite drops the offset of aware values
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+def get_user_projects(db: Session, user_id: int, limit: int, cursor: str = None, status: str = None,
+                      created_after: datetime.datetime = None, created_before: datetime.datetime = None):
+    """Return a page of a user's project metadata, newest first, and the cursor for the next page."""
+    query = db.query(
+        models.Project.id,
+        models.Project.uuid,
+        models.Project.status,
+        models.Project.voice,
+        models.Project.original_filename,
+        models.Project.created_at,
+        models.Project.updated_at
+    ).filter(models.Project.user_id == user_id)
+
+    if status:
+        query = query.filter(models.Project.status == status)
+    if created_after:
+        query = query.filter(models.Project.created_at >= to_naive_utc(created_after))
+    if created_before:
+        query = query.filter(models.Project.created_at < to_naive_utc(created_before))
+    if cursor:
+        # Keyset pagination: continue strictly after the last row of the previous page
+        cursor_created_at, cursor_id = decode_project_cursor(cursor)
+        query = query.filter(or_(
+            models.Project.created_at < cursor_created_at,
+            and_(models.Project.created_at == cursor_created_at, models.Project.id < cursor_id)
+        ))
+
+    rows = query.order_by(models.Project.created_at.desc(), models.Project.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_project_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
 def update_project_status(db: Session, project_id: int, status: str, b2_audio_file_key: str = None):
     db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if db_project:
@@ -60,7 +128,7 @@ def delete_project(db: Session, project_id: int):
         return True
     return False
 
-def add_project_to_queue(db: Session, project_id: int):
+def add_project_to_queue(db: Session, project_id: int, lane: str = STANDARD_LANE, text_length: int = 0):
     max_queue_size = 15
     queue_count = db.query(models.Queue).count()
     if queue_count >= max_queue_size:
@@ -72,7 +140,9 @@ def add_project_to_queue(db: Session, project_id: int):
 
     queue_entry = models.Queue(
         project_id=project_id,
-        position=next_position
+        position=next_position,
+        lane=lane,
+        text_length=text_length
     )
     db.add(queue_entry)
     db.commit()
@@ -94,15 +164,39 @@ def move_project_to_top(db: Session, project_id: int):
         # Update positions of other entries
         db.query(models.Queue).filter(models.Queue.position < queue_entry.position).update({models.Queue.position: models.Queue.position + 1})
         queue_entry.position = 1
+        queue_entry.prioritized = True
         db.commit()
         return True
     return False
 
-def get_next_project_in_queue(db: Session):
-    queue_entry = db.query(models.Queue).order_by(models.Queue.position).first()
-    if queue_entry:
-        return queue_entry.project_id
-    return None
+def get_next_project_in_queue(db: Session, lane: str = STANDARD_LANE):
+    """Pick the next project for a lane's worker.
+
+    Projects moved to the top always go first. The fast lane worker only takes
+    fast lane projects in order, so a long project never occupies it. The
+    standard worker is work-conserving by design: it takes any project,
+    shortest estimated job first with aging, so short projects also use it
+    whenever it would otherwise pick a longer job or sit idle.
+    """
+    query = db.query(models.Queue)
+    if lane == FAST_LANE:
+        query = query.filter(models.Queue.lane == FAST_LANE)
+    queue_entries = query.order_by(models.Queue.position).all()
+    if not queue_entries:
+        return None
+
+    prioritized = [entry for entry in queue_entries if entry.prioritized]
+    if prioritized:
+        return prioritized[0].project_id
+    if lane == FAST_LANE:
+        return queue_entries[0].project_id
+
+    now = datetime.datetime.utcnow()
+    def aged_length(entry):
+        waited = (now - entry.added_at).total_seconds()
+        return (entry.text_length or 0) - AGING_CHARS_PER_SECOND * waited
+    # min() keeps the earliest position on ties
+    return min(queue_entries, key=aged_length).project_id
 
 def get_user_queue(db: Session, user_id: int):
     queue_entries = db.query(models.Queue).join(models.Project).filter(models.Project.user_id == user_id).order_by(models.Queue.position).all()
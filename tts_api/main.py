@@ -1,8 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Response
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from . import models, crud, utils
-from .database import SessionLocal, engine
+from . import models, crud, utils, subtitles, voice_catalog, segments as segments_utils
+from .database import SessionLocal, engine, add_missing_columns, add_missing_indexes
 from fastapi.security import APIKeyHeader
 from typing import Optional
 import os
@@ -14,36 +14,44 @@ import logging
 import b2sdk.v2 as b2
 from dotenv import load_dotenv
 from pathlib import Path
+from contextlib import asynccontextmanager
 import httpx
+import json
 
-# Initialize logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("uvicorn.error")
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Configuration, database and voice catalog setup run at startup rather than at import
+    load_config()
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Base.metadata)
+    add_missing_indexes(models.Base.metadata)
+    voice_catalog.load_cache()
+    refresh_task = asyncio.create_task(voice_catalog.refresh_periodically())
+    yield
+    refresh_task.cancel()
 
-# Get the directory containing your script
-BASE_DIR = Path(__file__).resolve().parent
+app = FastAPI(lifespan=lifespan)
 
-# Load .env file with explicit path
 BASE_DIR = Path(__file__).resolve().parent.parent
-load_dotenv(BASE_DIR / '.env')
-
-# Debug logging for environment variables
-logger.debug("------------ Environment Variables Debug ------------")
-logger.debug(f"ADMIN_ACCESS from env: {os.getenv('ADMIN_ACCESS')}")
-logger.debug(f"Current directory: {os.getcwd()}")
-logger.debug(f"Looking for .env file at: {BASE_DIR / '.env'}")
-logger.debug(f"Does .env file exist? {(BASE_DIR / '.env').exists()}")
-logger.debug("--------------------------------------------------")
-
-# Read from environment variables
-ADMIN_ACCESS = os.getenv("ADMIN_ACCESS")
-B2_KEY_ID = os.getenv("B2_KEY_ID")
-B2_APPLICATION_KEY = os.getenv("B2_APPLICATION_KEY")
-B2_BUCKET_NAME = os.getenv("B2_BUCKET_NAME")
+
+# Settings from environment variables, set by load_config() at startup
+ADMIN_ACCESS = None
+FAST_LANE_MAX_CHARS = crud.DEFAULT_FAST_LANE_MAX_CHARS
+B2_KEY_ID = None
+B2_APPLICATION_KEY = None
+B2_BUCKET_NAME = None
+
+def load_config():
+    global ADMIN_ACCESS, FAST_LANE_MAX_CHARS, B2_KEY_ID, B2_APPLICATION_KEY, B2_BUCKET_NAME
+    # Load .env file with explicit path
+    load_dotenv(BASE_DIR / '.env')
+    ADMIN_ACCESS = os.getenv("ADMIN_ACCESS")
+    FAST_LANE_MAX_CHARS = int(os.getenv("FAST_LANE_MAX_CHARS", crud.DEFAULT_FAST_LANE_MAX_CHARS))
+    B2_KEY_ID = os.getenv("B2_KEY_ID")
+    B2_APPLICATION_KEY = os.getenv("B2_APPLICATION_KEY")
+    B2_BUCKET_NAME = os.getenv("B2_BUCKET_NAME")
 
 API_KEY_NAME = "api_key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -55,47 +63,61 @@ def get_db():
     finally:
         db.close()
 
-# List of available voices
-# List of available voices
-voices = [
-	("en-US-EricNeural", "American English - Male (Eric)"),
-	("en-US-ChristopherNeural", "American English - Male (Christopher)"),
-	("en-US-GuyNeural", "American Guy Multiple Speech"),
-	("en-GB-ThomasNeural", "British English - Male (Thomas)"),
-	("en-IN-PrabhatNeural", "Indian English - Male (Prabhat)"),
-	("en-IN-NeerjaNeural", "Indian English - Female (Neerja)"),
-	("hi-IN-MadhurNeural", "Hindi - Male (Madhur)"),
-	("hi-IN-SwaraNeural", "Hindi - Female (Swara)"),
-	("bn-IN-BashkarNeural", "Bengali - Male (Bashkar)"),
-	("bn-IN-TanishaaNeural", "Bengali - Female (Tanishaa)"),
-	("gu-IN-NiranjanNeural", "Gujarati - Male (Niranjan)"),
-	("gu-IN-DhwaniNeural", "Gujarati - Female (Dhwani)"),
-	("ta-IN-ValluvarNeural", "Tamil - Male (Valluvar)"),
-	("ta-IN-PallaviNeural", "Tamil - Female (Pallavi)"),
-	("te-IN-MohanNeural", "Telugu - Male (Mohan)"),
-	("te-IN-ShrutiNeural", "Telugu - Female (Shruti)"),
-	("es-ES-AlvaroNeural", "Spanish (Spain) - Male (Alvaro)"),
-	("fr-FR-HenriNeural", "French - Male (Henri)"),
-	("de-DE-KillianNeural", "German - Male (Killian)"),
-	("zh-CN-YunxiNeural", "Chinese (Mandarin) - Male (Yunxi)"),
-	("en-US-JennyNeural", "American English - Female (Jenny)")
-]
-
-# Create voice map
-voice_map = {voice[0]: voice[1] for voice in voices}
-
 async def text_to_speech(text, voice):
     communicate = edge_tts.Communicate(text, voice)
     audio_bytes = b""
+    boundaries = []
     try:
         async for chunk in communicate.stream():
             if chunk["type"] == "audio":
                 audio_bytes += chunk["data"]
-        return audio_bytes
+            elif chunk["type"] == "WordBoundary":
+                boundaries.append(subtitles.boundary_from_chunk(chunk))
+        if text.strip() and not boundaries:
+            # Subtitles depend on WordBoundary events, which edge-tts 7 no longer sends by default
+            logger.warning(f"No word boundaries received for voice {voice}, subtitles will be empty")
+        return audio_bytes, boundaries
     except Exception as e:
         logger.error(f"Error in text_to_speech: {e}")
         raise
 
+# Maximum number of segments of a multi-voice project synthesized at once
+MAX_CONCURRENT_SEGMENTS = 4
+
+# Maximum number of segments, after merging adjacent segments with the same voice
+MAX_SEGMENTS = 200
+
+async def synthesize_segments(segments):
+    """Synthesize segments concurrently and join them, in order, into one MP3 with shifted word timings."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
+
+    async def synthesize(segment):
+        async with semaphore:
+            return await text_to_speech(segment["text"], segment["voice"])
+
+    # Cancel the remaining segments as soon as one fails, rather than leaving their streams running
+    tasks = [asyncio.ensure_future(synthesize(segment)) for segment in segments]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+    for task in done:
+        if task.exception():
+            raise task.exception()
+    results = [task.result() for task in tasks]
+
+    audio_bytes = b""
+    boundaries = []
+    for segment_audio, segment_boundaries in results:
+        offset_ms = segments_utils.mp3_duration_ms(audio_bytes)
+        boundaries.extend(subtitles.shift_boundaries(segment_boundaries, offset_ms))
+        audio_bytes += segment_audio
+    return audio_bytes, boundaries
+
 def get_current_user(api_key: str = Depends(api_key_header), db: Session = Depends(get_db)):
     if not api_key:
         raise HTTPException(status_code=400, detail="API key missing")
@@ -104,12 +126,31 @@ def get_current_user(api_key: str = Depends(api_key_header), db: Session = Depen
         raise HTTPException(status_code=401, detail="Invalid API key")
     return user
 
-# Initialize processing flag
-processing = False
+# Subtitle formats: format -> (file extension, content type)
+SUBTITLE_FORMATS = {
+    "vtt": ("vtt", "text/vtt"),
+    "srt": ("srt", "application/x-subrip"),
+    "timing": ("json", "application/json"),
+}
+
+# Maximum number of projects returned by one page of /projects
+MAX_PROJECTS_PAGE_SIZE = 100
+
+# Lanes that currently have a queue worker running
+processing_lanes = set()
+
+def start_queue_worker(lane: str):
+    if lane not in processing_lanes:
+        processing_lanes.add(lane)
+        asyncio.create_task(process_queue(lane))
 
 @app.get("/voices")
-def get_voices():
-    return JSONResponse(content={"voices": voices})
+def get_voices(request: Request):
+    # The catalog is serialized once per refresh, clients can revalidate with If-None-Match
+    headers = {"ETag": voice_catalog.voices_etag, "Cache-Control": "public, max-age=3600"}
+    if voice_catalog.etag_matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=voice_catalog.voices_body, media_type="application/json", headers=headers)
 
 @app.post("/admin/create_api_key")
 def create_api_key(admin_access: str = Form(...), db: Session = Depends(get_db)):
@@ -139,14 +180,17 @@ async def create_project(
     voice: str = Form(...),
     file: UploadFile = File(None),
     text: str = Form(None), 
+    segments: str = Form(None),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if voice not in voice_map:
+    if voice not in voice_catalog.voice_map:
         raise HTTPException(status_code=400, detail="Invalid voice selection")
 
-    if text is None and file is None:
-        raise HTTPException(status_code=400, detail="Either text or file must be provided")
+    if text is None and file is None and segments is None:
+        raise HTTPException(status_code=400, detail="Either text, file or segments must be provided")
+    if segments is not None and (text is not None or file is not None):
+        raise HTTPException(status_code=400, detail="Segments cannot be combined with text or file")
 
     original_filename = None
     text_content = None
@@ -159,16 +203,33 @@ async def create_project(
         original_filename = "input.txt"
         text_content = text
 
+    # Multi-voice documents, either as a JSON segment list or <voice name="..."> markup
+    project_segments = None
+    try:
+        if segments is not None:
+            project_segments = segments_utils.parse_json(segments, MAX_SEGMENTS)
+        elif segments_utils.has_markup(text_content):
+            project_segments = segments_utils.parse_markup(text_content, voice, MAX_SEGMENTS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if project_segments:
+        if any(segment["voice"] not in voice_catalog.voice_map for segment in project_segments):
+            raise HTTPException(status_code=400, detail="Invalid voice selection")
+        text_content = "\n\n".join(segment["text"] for segment in project_segments)
+
     project = crud.create_project(
         db,
         user_id=current_user.id,
         voice=voice,
         text=text_content,
-        original_filename=original_filename
+        original_filename=original_filename,
+        segments=json.dumps(project_segments) if project_segments else None
     )
 
     # Add project to queue
-    added_to_queue = crud.add_project_to_queue(db, project.id)
+    lane = crud.queue_lane(len(text_content), FAST_LANE_MAX_CHARS)
+    added_to_queue = crud.add_project_to_queue(db, project.id, lane=lane, text_length=len(text_content))
     if not added_to_queue:
         # Queue is full
         project.status = "rejected"
@@ -177,12 +238,53 @@ async def create_project(
 
     db.commit()
 
-    # Start processing if not already running
-    if not processing:
-        asyncio.create_task(process_queue())
+    # Start processing if not already running, short texts also get the reserved fast lane worker
+    start_queue_worker(crud.STANDARD_LANE)
+    if lane == crud.FAST_LANE:
+        start_queue_worker(crud.FAST_LANE)
 
     return {"uuid": project.uuid, "status": project.status}
 
+@app.get("/projects")
+def list_projects(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    status: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the user's projects, newest first, with cursor-based pagination."""
+    if limit < 1 or limit > MAX_PROJECTS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {MAX_PROJECTS_PAGE_SIZE}")
+    try:
+        rows, next_cursor = crud.get_user_projects(
+            db,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            created_after=created_after,
+            created_before=created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "projects": [
+            {
+                "uuid": row.uuid,
+                "status": row.status,
+                "voice": row.voice,
+                "original_filename": row.original_filename,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
 @app.get("/queue")
 def view_queue(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     """View the current queue for the user."""
@@ -306,6 +408,41 @@ async def download_text(uuid: str, direct: bool = False, current_user: models.Us
         # Redirect to the download URL
         return RedirectResponse(url=project.b2_txt_download_url)
 
+@app.get("/projects/{uuid}/download/subtitles")
+async def download_subtitles(uuid: str, subtitle_format: str = Query("vtt", alias="format"), direct: bool = False,
+                             current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if subtitle_format not in SUBTITLE_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid subtitle format")
+    project = crud.get_project_by_uuid(db, uuid=uuid)
+    if not project or project.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.status != "completed":
+        raise HTTPException(status_code=400, detail="Project not completed yet")
+
+    extension, media_type = SUBTITLE_FORMATS[subtitle_format]
+    download_url = getattr(project, f"b2_{subtitle_format}_download_url")
+    if not download_url:
+        raise HTTPException(status_code=404, detail="Subtitle file not found")
+
+    if direct:
+        # Direct download through server
+        async with httpx.AsyncClient() as client:
+            response = await client.get(download_url)
+            if response.status_code != 200:
+                raise HTTPException(status_code=500, detail="Failed to download file")
+
+            filename = f"{project.original_filename}_{project.uuid}.{extension}"
+            return Response(
+                content=response.content,
+                media_type=media_type,
+                headers={
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+            )
+    else:
+        # Redirect to the download URL
+        return RedirectResponse(url=download_url)
+
 @app.delete("/projects/{uuid}")
 def delete_project(uuid: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     project = crud.get_project_by_uuid(db, uuid=uuid)
@@ -342,6 +479,17 @@ def delete_project(uuid: str, current_user: models.User = Depends(get_current_us
         except Exception as e:
             logger.error(f"Failed to delete text file from B2: {e}")
 
+    for subtitle_key in (project.b2_vtt_file_key, project.b2_srt_file_key, project.b2_timing_file_key):
+        if not subtitle_key:
+            continue
+        try:
+            file_versions = b2_bucket.ls(file_name=subtitle_key, recursive=True)
+            for file_version, _ in file_versions:
+                b2_bucket.delete_file_version(file_version.id_, file_version.file_name)
+            logger.info(f"Deleted subtitle file from B2: {subtitle_key}")
+        except Exception as e:
+            logger.error(f"Failed to delete subtitle file from B2: {e}")
+
     # Delete project from DB
     success = crud.delete_project(db, project_id=project.id)
     if not success:
@@ -368,13 +516,11 @@ def reset_database(admin_access: str = Form(...)):
 
     return {"detail": "Database reset successfully"}
 
-async def process_queue():
-    global processing
-    processing = True
+async def process_queue(lane: str):
     db = SessionLocal()
     try:
         while True:
-            project_id = crud.get_next_project_in_queue(db)
+            project_id = crud.get_next_project_in_queue(db, lane)
             if project_id is None:
                 break  # No more projects in queue
             # Update project status to 'processing'
@@ -386,7 +532,7 @@ async def process_queue():
                 crud.remove_project_from_queue(db, project_id)
                 await process_project(project_id)
     finally:
-        processing = False
+        processing_lanes.discard(lane)
         db.close()
 
 async def process_project(project_id: int):
@@ -416,7 +562,10 @@ async def process_project(project_id: int):
         # Perform text-to-speech
         try:
             logger.info(f"Converting text to speech for project {project.uuid}")
-            audio_bytes = await text_to_speech(project.text, project.voice)
+            if project.segments:
+                audio_bytes, boundaries = await synthesize_segments(json.loads(project.segments))
+            else:
+                audio_bytes, boundaries = await text_to_speech(project.text, project.voice)
         except Exception as e:
             project.status = "failed"
             logger.error(f"Failed to convert text to speech for project {project.uuid}: {e}")
@@ -475,6 +624,28 @@ async def process_project(project_id: int):
 
             logger.info(f"Audio file uploaded successfully: {audio_download_url}")
 
+            # Upload subtitles and the word timing index next to the MP3
+            subtitle_contents = {
+                "vtt": subtitles.to_vtt(boundaries),
+                "srt": subtitles.to_srt(boundaries),
+                "timing": subtitles.to_json(boundaries),
+            }
+            for subtitle_format, content in subtitle_contents.items():
+                extension, media_type = SUBTITLE_FORMATS[subtitle_format]
+                subtitle_key = f"{date_folder}/{base_name}_{unique_id}.{extension}"
+                try:
+                    logger.info(f"Uploading {subtitle_format} file to B2: {subtitle_key}")
+                    b2_bucket.upload_bytes(
+                        data_bytes=content.encode('utf-8'),
+                        file_name=subtitle_key,
+                        content_type=media_type
+                    )
+                    setattr(project, f"b2_{subtitle_format}_file_key", subtitle_key)
+                    setattr(project, f"b2_{subtitle_format}_download_url", b2_bucket.get_download_url(subtitle_key))
+                except Exception as e:
+                    # Subtitles are optional, the audio is still usable without them
+                    logger.error(f"Failed to upload {subtitle_format} file to B2: {e}")
+
             project.status = "completed"
         except Exception as e:
             project.status = "failed"
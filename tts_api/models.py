@@ -1,6 +1,6 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from .database import Base  # Corrected import
 import datetime
@@ -22,6 +22,7 @@ class Project(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     text = Column(Text)
     voice = Column(String)
+    segments = Column(Text)  # JSON list of {"voice", "text"} for multi-voice projects
     status = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -30,10 +31,23 @@ class Project(Base):
     b2_txt_file_key = Column(String)
     b2_audio_download_url = Column(String)
     b2_txt_download_url = Column(String)
+    b2_vtt_file_key = Column(String)
+    b2_srt_file_key = Column(String)
+    b2_timing_file_key = Column(String)
+    b2_vtt_download_url = Column(String)
+    b2_srt_download_url = Column(String)
+    b2_timing_download_url = Column(String)
 
     owner = relationship("User", back_populates="projects")
     queue_entry = relationship("Queue", back_populates="project", uselist=False)
 
+    __table_args__ = (
+        # Per-user history listing, newest first
+        Index("ix_projects_user_id_created_at", "user_id", "created_at"),
+        # Status scans such as finding stale processing projects
+        Index("ix_projects_status_updated_at", "status", "updated_at"),
+    )
+
 class Queue(Base):
     __tablename__ = "queue"
 
@@ -41,5 +55,8 @@ class Queue(Base):
     project_id = Column(Integer, ForeignKey("projects.id"), unique=True)
     position = Column(Integer, index=True)
     added_at = Column(DateTime, default=datetime.datetime.utcnow)
+    lane = Column(String, default="standard")
+    text_length = Column(Integer, default=0)
+    prioritized = Column(Boolean, default=False)
 
     project = relationship("Project", back_populates="queue_entry")
@@ -18,6 +18,7 @@ class User(UserBase):
 class ProjectBase(BaseModel):
     voice: str
     text: Optional[str] = None
+    segments: Optional[str] = None
 
 class ProjectCreate(ProjectBase):
     pass
@@ -34,6 +35,12 @@ class Project(ProjectBase):
     b2_txt_file_key: Optional[str]
     b2_audio_download_url: Optional[str]  # New field
     b2_txt_download_url: Optional[str]    # New field
+    b2_vtt_file_key: Optional[str]
+    b2_srt_file_key: Optional[str]
+    b2_timing_file_key: Optional[str]
+    b2_vtt_download_url: Optional[str]
+    b2_srt_download_url: Optional[str]
+    b2_timing_download_url: Optional[str]
 
     class Config:
         orm_mode = True
@@ -0,0 +1,67 @@
+# segments.py
+
+import json
+import re
+
+# Matches <voice name="...">...</voice> blocks in lightweight markup, with single or double quotes
+VOICE_TAG_PATTERN = re.compile(r"""<voice\s+name=(["'])([^"']+)\1\s*>(.*?)</voice>""", re.DOTALL | re.IGNORECASE)
+
+# Any opening or closing voice tag, used to find markup the pattern above did not consume
+ANY_VOICE_TAG_PATTERN = re.compile(r"</?voice\b", re.IGNORECASE)
+
+# edge-tts streams audio-24khz-48kbitrate-mono-mp3, i.e. 6 bytes per millisecond
+MP3_BYTES_PER_MS = 48_000 // 8 // 1000
+
+def has_markup(text: str):
+    return ANY_VOICE_TAG_PATTERN.search(text) is not None
+
+def merge_segments(segments: list, max_segments: int):
+    """Join adjacent segments with the same voice, then enforce the segment limit."""
+    merged = []
+    for segment in segments:
+        if merged and merged[-1]["voice"] == segment["voice"]:
+            merged[-1] = {"voice": segment["voice"], "text": merged[-1]["text"] + "\n\n" + segment["text"]}
+        else:
+            merged.append(segment)
+    if not merged:
+        raise ValueError("Segments must contain some text")
+    if len(merged) > max_segments:
+        raise ValueError(f"Documents are limited to {max_segments} segments")
+    return merged
+
+def parse_markup(text: str, default_voice: str, max_segments: int):
+    """Split text with <voice name="..."> tags into segments, untagged text uses the default voice."""
+    segments = []
+    position = 0
+    for match in VOICE_TAG_PATTERN.finditer(text):
+        segments.append({"voice": default_voice, "text": text[position:match.start()]})
+        segments.append({"voice": match.group(2), "text": match.group(3)})
+        position = match.end()
+    segments.append({"voice": default_voice, "text": text[position:]})
+    # Leftover tags are malformed, nested or unbalanced and would be read out loud
+    if any(ANY_VOICE_TAG_PATTERN.search(segment["text"]) for segment in segments):
+        raise ValueError("Malformed, nested or unbalanced <voice> tags")
+    return merge_segments([
+        {"voice": segment["voice"], "text": segment["text"].strip()}
+        for segment in segments
+        if segment["text"].strip()
+    ], max_segments)
+
+def parse_json(raw: str, max_segments: int):
+    """Parse a JSON list of {"voice": ..., "text": ...} objects into segments."""
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        raise ValueError("Segments must be valid JSON")
+    if not isinstance(data, list) or not data:
+        raise ValueError("Segments must be a non-empty list")
+    segments = []
+    for item in data:
+        if not isinstance(item, dict) or not isinstance(item.get("voice"), str) or not isinstance(item.get("text"), str):
+            raise ValueError("Each segment must have a voice and a text")
+        if item["text"].strip():
+            segments.append({"voice": item["voice"], "text": item["text"].strip()})
+    return merge_segments(segments, max_segments)
+
+def mp3_duration_ms(audio_bytes: bytes):
+    return len(audio_bytes) // MP3_BYTES_PER_MS
@@ -0,0 +1,59 @@
+# subtitles.py
+
+import json
+
+# edge-tts reports WordBoundary offsets and durations in 100-nanosecond ticks
+TICKS_PER_MS = 10_000
+
+# Maximum number of words grouped into a single subtitle cue
+WORDS_PER_CUE = 10
+
+def boundary_from_chunk(chunk: dict):
+    """Convert a WordBoundary stream chunk into a timing entry in milliseconds."""
+    start = chunk["offset"] // TICKS_PER_MS
+    end = (chunk["offset"] + chunk["duration"]) // TICKS_PER_MS
+    return {"text": chunk["text"], "start": start, "end": end}
+
+def shift_boundaries(boundaries: list, offset_ms: int):
+    """Move timing entries later by offset_ms, used when segments are concatenated."""
+    return [
+        {"text": b["text"], "start": b["start"] + offset_ms, "end": b["end"] + offset_ms}
+        for b in boundaries
+    ]
+
+def group_cues(boundaries: list, words_per_cue: int = WORDS_PER_CUE):
+    cues = []
+    for i in range(0, len(boundaries), words_per_cue):
+        words = boundaries[i:i + words_per_cue]
+        cues.append({
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": " ".join(word["text"] for word in words)
+        })
+    return cues
+
+def _format_timestamp(ms: int, separator: str):
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+def to_vtt(boundaries: list):
+    lines = ["WEBVTT", ""]
+    for cue in group_cues(boundaries):
+        lines.append(f"{_format_timestamp(cue['start'], '.')} --> {_format_timestamp(cue['end'], '.')}")
+        lines.append(cue["text"])
+        lines.append("")
+    return "\n".join(lines)
+
+def to_srt(boundaries: list):
+    lines = []
+    for index, cue in enumerate(group_cues(boundaries), start=1):
+        lines.append(str(index))
+        lines.append(f"{_format_timestamp(cue['start'], ',')} --> {_format_timestamp(cue['end'], ',')}")
+        lines.append(cue["text"])
+        lines.append("")
+    return "\n".join(lines)
+
+def to_json(boundaries: list):
+    return json.dumps({"words": boundaries}, ensure_ascii=False)
@@ -0,0 +1,135 @@
+# voice_catalog.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import edge_tts
+
+logger = logging.getLogger("uvicorn.error")
+
+# Default cache location, relative to the working directory, overridable with VOICE_CACHE_PATH
+DEFAULT_CACHE_PATH = "voices_cache.json"
+
+# How long a fetched catalog is considered fresh, in seconds
+CACHE_TTL = 24 * 60 * 60
+
+# Delay before retrying a failed refresh, in seconds
+RETRY_INTERVAL = 10 * 60
+
+# Offline fallback used until the cache is loaded or when edge-tts cannot be reached
+BUNDLED_VOICES = [
+	("en-US-EricNeural", "American English - Male (Eric)"),
+	("en-US-ChristopherNeural", "American English - Male (Christopher)"),
+	("en-US-GuyNeural", "American Guy Multiple Speech"),
+	("en-GB-ThomasNeural", "British English - Male (Thomas)"),
+	("en-IN-PrabhatNeural", "Indian English - Male (Prabhat)"),
+	("en-IN-NeerjaNeural", "Indian English - Female (Neerja)"),
+	("hi-IN-MadhurNeural", "Hindi - Male (Madhur)"),
+	("hi-IN-SwaraNeural", "Hindi - Female (Swara)"),
+	("bn-IN-BashkarNeural", "Bengali - Male (Bashkar)"),
+	("bn-IN-TanishaaNeural", "Bengali - Female (Tanishaa)"),
+	("gu-IN-NiranjanNeural", "Gujarati - Male (Niranjan)"),
+	("gu-IN-DhwaniNeural", "Gujarati - Female (Dhwani)"),
+	("ta-IN-ValluvarNeural", "Tamil - Male (Valluvar)"),
+	("ta-IN-PallaviNeural", "Tamil - Female (Pallavi)"),
+	("te-IN-MohanNeural", "Telugu - Male (Mohan)"),
+	("te-IN-ShrutiNeural", "Telugu - Female (Shruti)"),
+	("es-ES-AlvaroNeural", "Spanish (Spain) - Male (Alvaro)"),
+	("fr-FR-HenriNeural", "French - Male (Henri)"),
+	("de-DE-KillianNeural", "German - Male (Killian)"),
+	("zh-CN-YunxiNeural", "Chinese (Mandarin) - Male (Yunxi)"),
+	("en-US-JennyNeural", "American English - Female (Jenny)")
+]
+
+BUNDLED_VOICE_MAP = dict(BUNDLED_VOICES)
+
+# Current catalog, replaced as a whole on every load or refresh
+voices = []
+voice_map = {}
+voices_body = b""
+voices_etag = ""
+fetched_at = 0.0
+
+def _set_voices(new_voices, new_fetched_at: float):
+    global voices, voice_map, voices_body, voices_etag, fetched_at
+    voices_body = json.dumps({"voices": new_voices}).encode("utf-8")
+    voices_etag = f'"{hashlib.sha1(voices_body).hexdigest()}"'
+    voices = new_voices
+    voice_map = dict(new_voices)
+    fetched_at = new_fetched_at
+
+def cache_path():
+    # Read at call time so a VOICE_CACHE_PATH from .env, loaded at startup, is honoured
+    return Path(os.getenv("VOICE_CACHE_PATH", DEFAULT_CACHE_PATH))
+
+def _write_cache(data: dict):
+    """Write the cache atomically so concurrent workers never read a partial file."""
+    path = cache_path()
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            json.dump(data, tmp_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def etag_matches(if_none_match: str):
+    """Check an If-None-Match header, which may be *, a list of tags or weak W/ tags."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == voices_etag:
+            return True
+    return False
+
+def is_stale():
+    return time.time() - fetched_at > CACHE_TTL
+
+def load_cache():
+    """Load the on-disk catalog, keeping the bundled list if there is none."""
+    try:
+        data = json.loads(cache_path().read_text(encoding="utf-8"))
+        _set_voices([tuple(voice) for voice in data["voices"]], data["fetched_at"])
+        logger.info(f"Loaded {len(voices)} voices from cache")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to read voice cache: {e}")
+
+async def refresh():
+    """Fetch the catalog from edge-tts and write it to the on-disk cache."""
+    edge_voices = await edge_tts.list_voices()
+    new_voices = [
+        (voice["ShortName"], BUNDLED_VOICE_MAP.get(voice["ShortName"], voice.get("FriendlyName", voice["ShortName"])))
+        for voice in sorted(edge_voices, key=lambda voice: voice["ShortName"])
+    ]
+    if not new_voices:
+        raise ValueError("edge-tts returned an empty voice list")
+    now = time.time()
+    _set_voices(new_voices, now)
+    # Disk I/O runs off the event loop
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, _write_cache, {"fetched_at": now, "voices": new_voices})
+    logger.info(f"Refreshed voice catalog with {len(voices)} voices")
+
+async def refresh_periodically():
+    while True:
+        if is_stale():
+            try:
+                await refresh()
+            except Exception as e:
+                # Keep serving the cached or bundled catalog
+                logger.error(f"Failed to refresh voice catalog: {e}")
+        await asyncio.sleep(max(fetched_at + CACHE_TTL - time.time(), RETRY_INTERVAL))
+
+_set_voices(BUNDLED_VOICES, 0.0)